@@ -1,9 +1,9 @@
 from flask import Flask, request, send_file
 import cv2
 import numpy as np
+from numba import njit, prange
 import os
 from io import BytesIO
-from PIL import Image
 from flask_cors import CORS
 
 # Initialize Flask application
@@ -26,46 +26,31 @@ def is_valid_image(image_array, allowed_dimensions):
     """
     return image_array.shape in allowed_dimensions
 
-def rgb_to_ycbcr_lossless(img_bgr):
+@njit(parallel=True, fastmath=True, cache=True)
+def _embed_kernel(Y, W):
     """
-    Converts an RGB image to YCbCr color space using a transformation matrix.
+    Even-odd row embedding kernel: each row pair is replaced by its average +/- the scaled watermark.
     """
-    matrix = np.array([[0.299, 0.587, 0.114],
-                       [-0.168736, -0.331264, 0.5],
-                       [0.5, -0.418688, -0.081312]], dtype=np.float64)
-    return np.dot(img_bgr, matrix.T)
+    for i in prange(Y.shape[0] // 2):
+        for j in range(Y.shape[1]):
+            a = 0.5 * (Y[2 * i, j] + Y[2 * i + 1, j])
+            Y[2 * i, j] = a + W[i, j]
+            Y[2 * i + 1, j] = a - W[i, j]
 
-def ycbcr_to_rgb_lossless(img_ycrcb):
-    """
-    Converts a YCbCr image back to RGB color space.
-    """
-    matrix = np.array([[1.0, 0.0, 1.402],
-                       [1.0, -0.344136, -0.714136],
-                       [1.0, 1.772, 0.0]], dtype=np.float64)
-    return np.dot(img_ycrcb, matrix.T)
-
-def embedd_matrix(COVER, WATERMARK, alpha=ALPHA):
+def embedd_matrix(COVER, WATERMARK):
     """
     Embeds a watermark into the luminance (Y) channel of the cover image using even-odd row splitting.
+    WATERMARK must already be smoothed and scaled by alpha (see embed_watermark).
+    COVER is modified in place (and also returned).
     """
-    even = COVER[::2]
-    odd = COVER[1::2]
-
-    # Resize watermark if dimensions do not match
-    if even.shape != WATERMARK.shape:
-        WATERMARK = cv2.resize(WATERMARK, (even.shape[1], even.shape[0]))
+    half_shape = (COVER.shape[0] // 2, COVER.shape[1])
 
-    # Smooth watermark for better imperceptibility
-    WATERMARK = cv2.GaussianBlur(WATERMARK, (5, 5), 0)
-    WATERMARK = np.float64(WATERMARK) * alpha
+    # Watermark must cover one row per row pair
+    if WATERMARK.shape != half_shape:
+        raise ValueError(f"Watermark shape {WATERMARK.shape} does not match row-pair shape {half_shape}.")
 
-    # Average + watermark for even rows, average - watermark for odd rows
-    Aeven = (even + odd) / 2 + WATERMARK
-    Aodd = (even + odd) / 2 - WATERMARK
-
-    # Update COVER matrix with modified rows
-    COVER[::2] = Aeven
-    COVER[1::2] = Aodd
+    # Update COVER rows in place with the compiled kernel
+    _embed_kernel(COVER, WATERMARK)
     return COVER
 
 @app.route('/')
@@ -85,13 +70,12 @@ def embed_watermark():
         image_file = request.files['image']
         watermark_file = request.files['watermark']
 
-        # Convert uploaded images to RGB format
-        image = Image.open(image_file).convert('RGB')
-        watermark = Image.open(watermark_file).convert('RGB')
+        # Decode uploaded images straight into BGR uint8 arrays
+        image_np = cv2.imdecode(np.frombuffer(image_file.read(), np.uint8), cv2.IMREAD_COLOR)
+        watermark_np = cv2.imdecode(np.frombuffer(watermark_file.read(), np.uint8), cv2.IMREAD_COLOR)
 
-        # Convert to numpy arrays
-        image_np = np.array(image)
-        watermark_np = np.array(watermark)
+        if image_np is None or watermark_np is None:
+            return "Invalid image format or unable to decode.", 400
 
         # Validate image dimensions
         if not is_valid_image(image_np, ALLOWED_COVER_DIMENSIONS):
@@ -99,20 +83,28 @@ def embed_watermark():
         if not is_valid_image(watermark_np, ALLOWED_WATERMARK_DIMENSIONS):
             return "Invalid watermark dimensions.", 400
 
-        # Resize watermark to match image
-        watermark_resized = cv2.resize(watermark_np, (image_np.shape[1], image_np.shape[0]))
+        # Resize the watermark's red channel (index 2 in BGR) straight to the row-pair grid (half height), still as uint8
+        watermark_resized = cv2.resize(watermark_np[:, :, 2], (image_np.shape[1], image_np.shape[0] // 2))
+
+        # Smooth on uint8 (OpenCV's fast separable path), then scale once for better imperceptibility
+        watermark_scaled = cv2.GaussianBlur(watermark_resized, (5, 5), 0).astype(np.float32) * ALPHA
+
+        # Convert to YCrCb (OpenCV order, Y stays in channel 0) and embed watermark into Y channel
+        ycrcb_image = cv2.cvtColor(image_np, cv2.COLOR_BGR2YCrCb)
+        y_channel = np.ascontiguousarray(ycrcb_image[:, :, 0], dtype=np.float32)
+        embedd_matrix(y_channel, watermark_scaled)
 
-        # Convert to YCbCr and embed watermark into Y channel
-        ycbcr_image = rgb_to_ycbcr_lossless(image_np)
-        ycbcr_image[:, :, 0] = embedd_matrix(ycbcr_image[:, :, 0].copy(), watermark_resized[:, :, 0])
+        # Clamp the modified luminance in place and convert back to BGR
+        np.clip(y_channel, 0, 255, out=y_channel)
+        ycrcb_image[:, :, 0] = y_channel
+        embedded_image = cv2.cvtColor(ycrcb_image, cv2.COLOR_YCrCb2BGR)
 
-        # Convert back to RGB and clamp pixel values
-        embedded_image = ycbcr_to_rgb_lossless(ycbcr_image)
-        embedded_image = np.clip(embedded_image, 0, 255).astype(np.uint8)
+        # Encode result as PNG (low compression level for fast encoding) and return it
+        is_success, buffer = cv2.imencode(".png", embedded_image, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        if not is_success:
+            return "Failed to encode embedded image.", 500
 
-        # Save result to in-memory buffer and return it
-        byte_io = BytesIO()
-        Image.fromarray(embedded_image).save(byte_io, 'PNG')
+        byte_io = BytesIO(buffer)
         byte_io.seek(0)
 
         return send_file(byte_io, mimetype='image/png')
@@ -125,4 +117,4 @@ def embed_watermark():
 
 if __name__ == '__main__':
     # Start the Flask development server
-    app.run(port=5001, debug=True)
+    app.run(port=5001)
@@ -4,6 +4,7 @@ import os
 from io import BytesIO
 import traceback
 import cv2
+from numba import njit, prange
 from flask_cors import CORS
 
 # Initialize Flask application
@@ -18,49 +19,74 @@ ALPHA = 0.07  # Must match the alpha used during embedding
 EXPECTED_WATERMARK_SHAPE = (32, 32)  # Final expected watermark size for output
 # ---
 
-def recover_watermark_channel(channel_data, alpha=ALPHA):
+@njit(parallel=True, fastmath=True, cache=True)
+def _recover_kernel(image, alpha):
     """
-    Recovers watermark signal from a single image channel (e.g., Y, Cr, or Cb).
-    Uses even-odd row difference based on the embedding strategy.
+    Even-odd row difference kernel over a uint8 H x W x C image: (even - odd) / (2 * alpha)
+    for every row pair, min-max stretched to 0-255 per channel. Pixels are converted
+    per element, and the first pass only tracks per-row min/max, so no float copy
+    of the image or of the difference is ever stored.
+    """
+    h = image.shape[0] // 2
+    w = image.shape[1]
+    channels = image.shape[2]
+    scale = np.float32(1.0 / (2.0 * alpha))
+    row_min = np.empty((h, channels), dtype=np.float32)
+    row_max = np.empty((h, channels), dtype=np.float32)
+    for i in prange(h):
+        for c in range(channels):
+            v = (np.float32(image[2 * i, 0, c]) - np.float32(image[2 * i + 1, 0, c])) * scale
+            row_min[i, c] = v
+            row_max[i, c] = v
+        for j in range(w):
+            for c in range(channels):
+                v = (np.float32(image[2 * i, j, c]) - np.float32(image[2 * i + 1, j, c])) * scale
+                row_min[i, c] = min(row_min[i, c], v)
+                row_max[i, c] = max(row_max[i, c], v)
+
+    # Same convention as cv2.NORM_MINMAX: a flat channel maps to all zeros
+    wm_min = np.empty(channels, dtype=np.float32)
+    stretch = np.empty(channels, dtype=np.float32)
+    for c in range(channels):
+        wm_min[c] = row_min[:, c].min()
+        span = row_max[:, c].max() - wm_min[c]
+        stretch[c] = 255.0 / span if span > 0 else 0.0
+
+    out = np.empty((h, w, channels), dtype=np.uint8)
+    for i in prange(h):
+        for j in range(w):
+            for c in range(channels):
+                v = (np.float32(image[2 * i, j, c]) - np.float32(image[2 * i + 1, j, c])) * scale
+                v = (v - wm_min[c]) * stretch[c]
+                out[i, j, c] = np.uint8(min(max(v, 0.0), 255.0))
+    return out
+
+def recover_watermark(image_data, alpha=ALPHA):
+    """
+    Recovers the watermark signal from all channels of an H x W x C image (e.g., YCrCb) at once.
+    Uses even-odd row difference based on the embedding strategy; each channel is normalized separately.
     """
     try:
         # Validate input
-        if channel_data is None or channel_data.ndim != 2:
-            print(f"Error: Invalid channel data: {type(channel_data)}")
+        if image_data is None or image_data.ndim != 3:
+            print(f"Error: Invalid image data: {type(image_data)}")
             return None
 
-        h, w = channel_data.shape
+        h = image_data.shape[0]
 
         # Ensure the height is even for row-pair processing
         if h % 2 != 0:
-            print(f"Warning: Channel height {h} is odd. Cropping.")
-            channel_data = channel_data[:-1, :]
+            print(f"Warning: Image height {h} is odd. Cropping.")
+            image_data = image_data[:-1]
             h -= 1
             if h == 0:
                 return None
 
-        # Convert to float for calculations
-        channel_data_float = channel_data.astype(np.float32)
-
-        # Extract even and odd rows
-        even = channel_data_float[::2, :]
-        odd = channel_data_float[1::2, :]
-
-        # Ensure shapes still match
-        if even.shape != odd.shape:
-            print("Error: Mismatched row shapes.")
-            return None
-
-        # Recover watermark: difference of even and odd rows, scaled by alpha
-        wm_float = (even - odd) / (2 * alpha)
-
-        # Normalize watermark for visibility (stretch to 0–255)
-        wm_normalized = cv2.normalize(wm_float, None, 0, 255, cv2.NORM_MINMAX)
-
-        return wm_normalized.astype(np.uint8)
+        # Recover watermark (even-odd row difference scaled by alpha), stretched to 0–255 for visibility
+        return _recover_kernel(image_data, np.float32(alpha))
 
     except Exception as e:
-        print(f"Error in watermark channel recovery: {e}")
+        print(f"Error in watermark recovery: {e}")
         traceback.print_exc()
         return None
 
@@ -96,40 +122,30 @@ def extract_watermark():
 
         # --- Convert BGR to YCrCb Color Space ---
         image_ycrcb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2YCrCb)
-        y_channel, cr_channel, cb_channel = cv2.split(image_ycrcb)
-
-        print(f"Input Channel shapes - Y: {y_channel.shape}, Cr: {cr_channel.shape}, Cb: {cb_channel.shape}")
+        print(f"Input YCrCb shape: {image_ycrcb.shape}")
 
-        # --- Recover Watermark from All Three Channels ---
-        watermark_y = recover_watermark_channel(y_channel)
-        watermark_cr = recover_watermark_channel(cr_channel)
-        watermark_cb = recover_watermark_channel(cb_channel)
+        # --- Recover Watermark from All Three Channels in One Pass ---
+        recovered_ycrcb = recover_watermark(image_ycrcb)
 
-        if watermark_y is None or watermark_cr is None or watermark_cb is None:
-            errors = []
-            if watermark_y is None: errors.append("Y channel recovery failed.")
-            if watermark_cr is None: errors.append("Cr channel recovery failed.")
-            if watermark_cb is None: errors.append("Cb channel recovery failed.")
-            return jsonify({"error": "Failed to extract watermark.", "details": errors}), 500
+        if recovered_ycrcb is None:
+            return jsonify({"error": "Failed to extract watermark.", "details": ["YCrCb channel recovery failed."]}), 500
 
-        # --- Merge Recovered Channels to Form YCrCb Watermark ---
-        recovered_ycrcb = cv2.merge([watermark_y, watermark_cr, watermark_cb])
-        print(f"Merged watermark shape: {recovered_ycrcb.shape}")
+        print(f"Recovered watermark shape: {recovered_ycrcb.shape}")
 
         # --- Convert to BGR for viewing ---
         try:
             recovered_bgr = cv2.cvtColor(recovered_ycrcb, cv2.COLOR_YCrCb2BGR)
         except cv2.error as cvt_error:
             print("Color conversion failed, returning grayscale Y watermark.")
-            is_success, buffer = cv2.imencode(".png", watermark_y)
+            is_success, buffer = cv2.imencode(".png", np.ascontiguousarray(recovered_ycrcb[:, :, 0]))
             if not is_success:
                 return jsonify({"error": "Failed to encode fallback grayscale watermark"}), 500
             byte_io = BytesIO(buffer)
             byte_io.seek(0)
             return send_file(byte_io, mimetype='image/png', download_name='extracted_watermark_gray.png')
 
-        # --- Resize to Expected Output Dimensions ---
-        final_watermark = cv2.resize(recovered_bgr, EXPECTED_WATERMARK_SHAPE[::-1], interpolation=cv2.INTER_LINEAR)
+        # --- Area-Average Down to Expected Output Dimensions ---
+        final_watermark = cv2.resize(recovered_bgr, EXPECTED_WATERMARK_SHAPE[::-1], interpolation=cv2.INTER_AREA)
         print(f"Final watermark size: {final_watermark.shape}")
 
         # --- Encode and Send Output ---
@@ -158,4 +174,4 @@ def extract_watermark():
 
 if __name__ == '__main__':
     # Run the Flask app (default to port 5000 for extraction)
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    app.run(host='0.0.0.0', port=5000)
@@ -1,38 +1,56 @@
-import threading
 import subprocess
+import signal
 import os
 
-# --- Functions to launch each backend service ---
-
-def run_embed():
-    """Launch the embed server on port 5001."""
-    print("Starting embed server on port 5001...")
-    subprocess.run(["python", "embed_backend.py"], cwd=os.getcwd())
-
-def run_extract():
-    """Launch the extract server on port 5000."""
-    print("Starting extract server on port 5000...")
-    subprocess.run(["python", "extract_backend.py"], cwd=os.getcwd())
-
-def run_verify():
-    """Launch the verify server on port 5002."""
-    print("Starting verify server on port 5002...")
-    subprocess.run(["python", "verify_backend.py"], cwd=os.getcwd())
+# --- Gunicorn settings: a few single-threaded sync workers per service ---
+# Each worker already spreads its kernels across all cores (Numba prange, OpenCV),
+# so more workers or request threads would only oversubscribe the CPU.
+WORKERS = "2"
+
+# --- Backend services: (name, WSGI app, bind address) ---
+SERVICES = [
+    ("embed", "embed_backend:app", "127.0.0.1:5001"),
+    ("extract", "extract_backend:app", "0.0.0.0:5000"),
+    ("verify", "verify_backend:app", "127.0.0.1:5002"),
+]
+
+def gunicorn_command(app, bind):
+    """Build the gunicorn command line for a backend app."""
+    return ["gunicorn", "-w", WORKERS, "-k", "sync", "-b", bind, app]
+
+def start_service(name, app, bind):
+    """Launch a backend server as a child process."""
+    print(f"Starting {name} server on {bind}...")
+    return subprocess.Popen(gunicorn_command(app, bind), cwd=os.getcwd())
+
+def stop_services(procs):
+    """Terminate every backend server that is still running and reap them all."""
+    for proc in procs:
+        if proc.poll() is None:
+            proc.terminate()
+    for proc in procs:
+        proc.wait()
+
+def handle_sigterm(signum, frame):
+    """Turn SIGTERM (systemd/docker stop) into a normal exit so the children get reaped."""
+    raise SystemExit(128 + signum)
 
 # --- Main Execution ---
 
 if __name__ == "__main__":
-    # Create separate threads for each backend server
-    thread_embed = threading.Thread(target=run_embed)
-    thread_extract = threading.Thread(target=run_extract)
-    thread_verify = threading.Thread(target=run_verify)
-
-    # Start all threads
-    thread_embed.start()
-    thread_extract.start()
-    thread_verify.start()
-
-    # Wait for all threads to complete (blocks main thread)
-    thread_embed.join()
-    thread_extract.join()
-    thread_verify.join()
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
+    # Launch all backend servers directly as child processes
+    procs = [start_service(*service) for service in SERVICES]
+
+    try:
+        # Wait for all servers to exit (blocks main process)
+        for proc in procs:
+            proc.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Ignore further Ctrl+C/SIGTERM so shutdown can't be interrupted halfway
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        stop_services(procs)
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from extract_backend import ALPHA, recover_watermark
+
+def reference_recover(image, alpha=ALPHA):
+    """ Per-channel recovery as done before the fused kernel (cv2.normalize + astype). """
+    channels = []
+    for c in range(image.shape[2]):
+        channel = image[:, :, c].astype(np.float32)
+        wm_float = (channel[::2] - channel[1::2]) / (2 * alpha)
+        channels.append(cv2.normalize(wm_float, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8))
+    return np.dstack(channels)
+
+def test_recover_watermark_matches_normalize_reference():
+    """ The fused kernel must match the cv2.normalize path up to float rounding (one grey level). """
+    rng = np.random.default_rng(0)
+    for _ in range(10):
+        image = rng.integers(0, 256, (64, 48, 3), dtype=np.uint8)
+        recovered = recover_watermark(image)
+        expected = reference_recover(image)
+        assert recovered.dtype == np.uint8
+        assert recovered.shape == expected.shape
+        assert np.abs(recovered.astype(np.int16) - expected).max() <= 1
+
+def test_recover_watermark_flat_channel_maps_to_zero():
+    """ A channel with no even-odd difference stretches to all zeros, like NORM_MINMAX. """
+    rng = np.random.default_rng(1)
+    image = rng.integers(0, 256, (64, 48, 3), dtype=np.uint8)
+    image[:, :, 1] = 77
+    recovered = recover_watermark(image)
+    assert not recovered[:, :, 1].any()
+    assert np.array_equal(recovered[:, :, 1], reference_recover(image)[:, :, 1])
+
+def test_recover_watermark_crops_odd_height():
+    """ An odd trailing row is dropped before pairing rows. """
+    rng = np.random.default_rng(2)
+    image = rng.integers(0, 256, (65, 48, 3), dtype=np.uint8)
+    assert recover_watermark(image).shape == (32, 48, 3)
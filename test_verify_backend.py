@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from verify_backend import correlation_coefficient, fast_ssim
+
+def test_fast_ssim_matches_skimage():
+    """ fast_ssim must agree with skimage's structural_similarity defaults. """
+    skimage_metrics = pytest.importorskip("skimage.metrics")
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        a = rng.integers(0, 256, (32, 32, 3), dtype=np.uint8)
+        b = rng.integers(0, 256, (32, 32, 3), dtype=np.uint8)
+        expected = skimage_metrics.structural_similarity(a, b, channel_axis=-1)
+        assert fast_ssim(a, b) == pytest.approx(expected, abs=1e-6)
+
+        # /verify passes float32 copies with an explicit data range
+        assert fast_ssim(a.astype(np.float32), b.astype(np.float32), data_range=255.0) == pytest.approx(expected, abs=1e-6)
+
+def test_fast_ssim_rejects_images_smaller_than_window():
+    """ An image smaller than the window has no valid SSIM region. """
+    a = np.zeros((5, 5, 3), dtype=np.uint8)
+    with pytest.raises(ValueError):
+        fast_ssim(a, a)
+
+def test_correlation_coefficient_matches_corrcoef():
+    """ correlation_coefficient must agree with np.corrcoef and give exactly 1.0 for identical images. """
+    rng = np.random.default_rng(0)
+    a = rng.integers(0, 256, (32, 32, 3), dtype=np.uint8)
+    b = np.clip(a.astype(np.int16) + rng.integers(-20, 21, a.shape), 0, 255).astype(np.uint8)
+
+    assert correlation_coefficient(a, a) == 1.0
+    assert correlation_coefficient(a.astype(np.float32), a.astype(np.float32)) == 1.0
+
+    expected = np.corrcoef(a.ravel(), b.ravel())[0, 1]
+    assert correlation_coefficient(a.astype(np.float32), b.astype(np.float32)) == pytest.approx(expected, abs=1e-12)
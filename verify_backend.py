@@ -2,15 +2,15 @@ from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
 import cv2
 import numpy as np
-from skimage.metrics import structural_similarity as ssim
-import warnings
 import math
 import os
+from io import BytesIO
 from datetime import datetime
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.platypus import Table, TableStyle
 from reportlab.lib import colors
+from reportlab.lib.utils import ImageReader
 
 # --- Setup Paths ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -21,6 +21,68 @@ STATIC_REPORT_DIR = os.path.join(STATIC_FOLDER, "reports")
 app = Flask(__name__)
 CORS(app)
 
+def fast_ssim(img1, img2, win_size=7, data_range=255.0, K1=0.01, K2=0.03):
+    """
+    Mean SSIM of two same-sized images, matching skimage's structural_similarity defaults
+    (7x7 uniform window, sample covariance, border crop, mean over channels).
+    The window filtering runs in OpenCV's box filter instead of scipy.ndimage.
+    Statistics are computed in float64 (as skimage does for uint8 input), since
+    E[x^2] - E[x]^2 on values up to 255^2 loses precision in float32.
+    """
+    a = np.asarray(img1, dtype=np.float64)
+    b = np.asarray(img2, dtype=np.float64)
+
+    # Window must fit inside the image, otherwise the cropped SSIM map is empty
+    if min(a.shape[:2]) < win_size:
+        raise ValueError(f"Images of shape {a.shape} are smaller than the {win_size}x{win_size} SSIM window.")
+
+    ksize = (win_size, win_size)
+
+    # Local means, variances and covariance over the window
+    mu_a = cv2.blur(a, ksize)
+    mu_b = cv2.blur(b, ksize)
+    cov_norm = win_size ** 2 / (win_size ** 2 - 1)
+    var_a = cov_norm * (cv2.blur(a * a, ksize) - mu_a * mu_a)
+    var_b = cov_norm * (cv2.blur(b * b, ksize) - mu_b * mu_b)
+    cov_ab = cov_norm * (cv2.blur(a * b, ksize) - mu_a * mu_b)
+
+    C1 = (K1 * data_range) ** 2
+    C2 = (K2 * data_range) ** 2
+
+    # SSIM map, computed in place on the window statistics
+    numerator = mu_a * mu_b
+    numerator *= 2
+    numerator += C1
+    cov_ab *= 2
+    cov_ab += C2
+    numerator *= cov_ab
+
+    denominator = np.square(mu_a, out=mu_a)
+    denominator += np.square(mu_b, out=mu_b)
+    denominator += C1
+    var_a += var_b
+    var_a += C2
+    denominator *= var_a
+
+    ssim_map = np.divide(numerator, denominator, out=numerator)
+
+    # Ignore the border where the window runs off the image, as skimage does
+    pad = (win_size - 1) // 2
+    return float(ssim_map[pad:-pad, pad:-pad].mean())
+
+def correlation_coefficient(img1, img2):
+    """
+    Pearson correlation of two same-sized images, equivalent to np.corrcoef(...)[0, 1]
+    without building the 2xN stack. Dot products run in float64 and the result is
+    clipped to [-1, 1], as np.corrcoef does.
+    """
+    a = np.asarray(img1, dtype=np.float64).ravel()
+    b = np.asarray(img2, dtype=np.float64).ravel()
+    a = a - a.mean()
+    b = b - b.mean()
+    r = (a @ b) / (np.sqrt(a @ a) * np.sqrt(b @ b))
+    return float(np.clip(r, -1.0, 1.0))
+
 @app.route('/')
 def home():
     """Health check endpoint."""
@@ -55,18 +117,20 @@ def verify_watermarks():
 
         # --- Metric Calculations ---
 
+        # Convert to float32 once; the metrics share these arrays (fast_ssim promotes to float64 internally)
+        a = initial_watermark.astype(np.float32)
+        b = extracted_watermark.astype(np.float32)
+
         # PSNR (Peak Signal-to-Noise Ratio)
-        mse = np.mean((initial_watermark.astype("float") - extracted_watermark.astype("float")) ** 2)
+        mse = cv2.norm(a, b, cv2.NORM_L2SQR) / a.size
         PIXEL_MAX = 255.0
         psnr_value = 999.99 if mse == 0 else 10 * math.log10((PIXEL_MAX ** 2) / mse)
 
         # SSIM (Structural Similarity Index)
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            ssim_value = ssim(initial_watermark, extracted_watermark, channel_axis=-1)
+        ssim_value = fast_ssim(a, b, data_range=PIXEL_MAX)
 
         # Correlation Coefficient
-        correlation = np.corrcoef(initial_watermark.flatten(), extracted_watermark.flatten())[0, 1]
+        correlation = correlation_coefficient(a, b)
 
         # Determine image authenticity
         status = "Authentic" if (psnr_value >= 30 and ssim_value >= 0.95 and correlation >= 0.98) else "Tampered"
@@ -78,11 +142,9 @@ def verify_watermarks():
         report_filename = f"report_{timestamp}.pdf"
         report_path = os.path.join(STATIC_REPORT_DIR, report_filename)
 
-        # Save temporary images
-        initial_img_path = os.path.join(STATIC_REPORT_DIR, f"initial_{timestamp}.png")
-        extracted_img_path = os.path.join(STATIC_REPORT_DIR, f"extracted_{timestamp}.png")
-        cv2.imwrite(initial_img_path, initial_watermark)
-        cv2.imwrite(extracted_img_path, extracted_watermark)
+        # Encode images in memory for embedding in the PDF
+        initial_img = ImageReader(BytesIO(cv2.imencode(".png", initial_watermark)[1].tobytes()))
+        extracted_img = ImageReader(BytesIO(cv2.imencode(".png", extracted_watermark)[1].tobytes()))
 
         # Create PDF canvas
         pdf = canvas.Canvas(report_path, pagesize=A4)
@@ -98,8 +160,8 @@ def verify_watermarks():
         pdf.drawString(320, height - 130, "Extracted Watermark:")
 
         # Display images on PDF
-        pdf.drawImage(initial_img_path, 100, height - 280, width=150, height=150, preserveAspectRatio=True)
-        pdf.drawImage(extracted_img_path, 320, height - 280, width=150, height=150, preserveAspectRatio=True)
+        pdf.drawImage(initial_img, 100, height - 280, width=150, height=150, preserveAspectRatio=True)
+        pdf.drawImage(extracted_img, 320, height - 280, width=150, height=150, preserveAspectRatio=True)
 
         # Metric table data
         table_data = [
@@ -132,10 +194,6 @@ def verify_watermarks():
         # Save the PDF report
         pdf.save()
 
-        # Delete temporary image files
-        os.remove(initial_img_path)
-        os.remove(extracted_img_path)
-
         # Return metrics and download link
         download_link = f"http://localhost:5002/download/{report_filename}"
         result = {
@@ -160,4 +218,4 @@ def download_report(filename):
     return send_from_directory(STATIC_REPORT_DIR, filename)
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5002)
+    app.run(port=5002)